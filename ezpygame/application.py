@@ -1,5 +1,55 @@
+import time
+
 import pygame
 
+_SENTINEL = object()
+
+# How long before a frame's deadline to stop sleeping and start spinning
+_SPIN_NS = 500000
+
+# Optional subsystems and the pygame modules that implement them
+_SUBSYSTEMS = {
+    'audio': 'mixer',
+    'joystick': 'joystick',
+    'font': 'font',
+}
+
+# Above this many dirty rects, updating the whole display is faster
+_MAX_DIRTY_RECTS = 50
+
+# How many fixed timesteps can be run per frame to catch up
+_MAX_STEPS = 4
+
+
+def _coalesce_rects(rects, screen_area):
+    """Merge touching or overlapping rects into their bounding rects.
+
+    If there are too many rects, or they cover more pixels than the
+    screen has, a full refresh is cheaper and ``None`` is returned.
+
+    :param iterable rects: dirty rects to merge
+    :param int screen_area: amount of pixels on the screen
+    :return: merged rects, or ``None`` to refresh the whole screen
+    :rtype: list[pygame.Rect]|None
+    """
+    rects = [pygame.Rect(rect) for rect in rects]
+    if (len(rects) > _MAX_DIRTY_RECTS
+            or sum(rect.w * rect.h for rect in rects) > screen_area):
+        return None
+    merged = []
+    for rect in rects:
+        # A grown union may touch rects it didn't touch before
+        while True:
+            touching = rect.inflate(2, 2).collidelistall(merged)
+            if not touching:
+                break
+            rect = rect.unionall([merged[i] for i in touching])
+            touching = set(touching)
+            merged = [other for i, other in enumerate(merged)
+                      if i not in touching]
+        merged.append(rect)
+    return merged
+
 
 class Application:
     """A simple wrapper around :mod:`pygame` for running games easily.
@@ -10,6 +60,59 @@ class Application:
     :param str|None title: title to display in the window's title bar
     :param tuple[int,int]|None resolution: resolution of the game window
     :param int|None update_rate: how many times per second to update
+    :param str pacing_mode: ``'sleep'``, ``'spin'`` or ``'vsync_only'``
+    :param int flags: flags for :func:`pygame.display.set_mode`
+    :param bool vsync: synchronize display updates with the monitor
+    :param bool fixed_timestep: update with a constant ``dt``
+    :param bool audio: initialize :mod:`pygame.mixer`
+    :param bool joystick: initialize :mod:`pygame.joystick`
+    :param bool font: initialize :mod:`pygame.font`
+
+    The ``pacing_mode`` decides how the frame rate is kept:
+
+    - ``'sleep'`` (default) sleeps between frames and only spins for
+      the last half a millisecond, which is light on the CPU and lets
+      other threads run in the meantime.
+    - ``'spin'`` spins through the whole delay for the most accurate
+      frame rate, at the cost of keeping one CPU core fully busy.
+    - ``'vsync_only'`` turns ``vsync`` on and doesn't delay the frames
+      at all, leaving the pacing to the display's refresh rate.
+      Only displays with the :data:`pygame.SCALED` or
+      :data:`pygame.OPENGL` flag support vsync, so on other displays,
+      and on frames where nothing is presented, the frames are delayed
+      like with ``'sleep'``.
+
+    With ``fixed_timestep``, scenes are always updated with the same
+    ``dt`` of ``1000 / update_rate`` milliseconds.  If a frame takes
+    longer than that, the scene is updated several times before it's
+    drawn, so the game logic keeps its pace even when the drawing
+    doesn't.  The :attr:`interpolation` tells how far (from 0 to 1)
+    the application is between two updates when a scene is drawn, for
+    smoothing out movement.  Combined with ``'vsync_only'`` pacing,
+    the scene is drawn at the display's refresh rate but still updated
+    at the ``update_rate``.
+
+    The ``flags`` and ``vsync`` are passed to
+    :func:`pygame.display.set_mode` whenever the resolution is set,
+    so e.g. ``flags=pygame.SCALED, vsync=True`` gives a hardware
+    accelerated display.  With :data:`pygame.OPENGL`,
+    :data:`pygame.SCALED` or :data:`pygame.DOUBLEBUF` the whole
+    display is always flipped at once, as the dirty rects returned by
+    :meth:`.Scene.draw` only speed up software rendered displays.
+
+    Only the display and timer (and by default the font module) are
+    initialized, as opening the audio device and enumerating joysticks
+    can take a noticeable amount of time on slower devices.  Pass
+    ``audio=True`` or ``joystick=True`` if the game needs them from the
+    start, or list them in a scene's ``required_subsystems`` to have
+    them initialized only when that scene is first entered.  All of
+    them are shut down again with :meth:`quit`, which is also called
+    when the application is used as a context manager:
+
+    .. code-block:: python
+
+        with ezpygame.Application('Game', (1280, 720), 60) as app:
+            app.run(Menu())
 
     If any parameters are left to ``None``, these settings must be
     defined either manually through ``application.<setting> = value``
@@ -32,26 +135,87 @@ class Application:
         )
         main_menu = Menu()
         app.run(main_menu)
+
+    The application uses ``__slots__``, so arbitrary attributes
+    can't be assigned to it unless it's subclassed.
     """
+    __slots__ = (
+        'flags', 'vsync', 'fixed_timestep', 'interpolation',
+        '_title', '_pacing_mode', '_update_rate',
+        '_frame_ms', '_frame_ns', '_last_frame_ns', '_deadline_ns',
+        '_screen', '_display_mode', '_hardware', '_vsynced', '_subsystems',
+        '_scene', '_pending_scene', '_running', '_event_mask', '_needs_events',
+        '_blocked_events',
+    )
 
     def __init__(self,
                  title=None,
                  resolution=None,
-                 update_rate=None):
-        pygame.init()
+                 update_rate=None,
+                 pacing_mode='sleep',
+                 flags=0,
+                 vsync=False,
+                 fixed_timestep=False,
+                 audio=False,
+                 joystick=False,
+                 font=True):
+        pygame.display.init()
+        # Initializes SDL's timer for pygame.time.get_ticks(), which
+        # pygame.display.init() doesn't and pygame.init() would
+        pygame.time.wait(0)
+        self._display_mode = None
+        self._subsystems = set()
+        if audio:
+            self._init_subsystem('audio')
+        if joystick:
+            self._init_subsystem('joystick')
+        if font:
+            self._init_subsystem('font')
         self.update_rate = update_rate
+        self.pacing_mode = pacing_mode
+        self.flags = flags
+        self.vsync = vsync
+        self.fixed_timestep = fixed_timestep
+        self.interpolation = 0.0
         self._scene = None
+        self._pending_scene = _SENTINEL
+        self._running = False
+        self._blocked_events = None
         # Trigger property setters
         self.title = title
         self.resolution = resolution
 
+    @property
+    def update_rate(self):
+        return self._update_rate
+
+    @update_rate.setter
+    def update_rate(self, value):
+        self._update_rate = value
+        self._frame_ms = 1000 // value if value else 0
+        self._frame_ns = 1000000000 // value if value else 0
+
+    @property
+    def pacing_mode(self):
+        return self._pacing_mode
+
+    @pacing_mode.setter
+    def pacing_mode(self, value):
+        if value not in ('sleep', 'spin', 'vsync_only'):
+            raise ValueError('Unknown pacing mode: {!r}'.format(value))
+        self._pacing_mode = value
+        if self._display_mode is not None:
+            # Turn vsync on or off for 'vsync_only'
+            self.resolution = self._display_mode[0]
+
     @property
     def title(self):
-        return pygame.display.get_caption()
+        return self._title
 
     @title.setter
     def title(self, value):
         pygame.display.set_caption(value)
+        self._title = value
 
     @property
     def resolution(self):
@@ -59,34 +223,134 @@ class Application:
 
     @resolution.setter
     def resolution(self, value):
-        self._screen = pygame.display.set_mode(value)
+        vsync = self.vsync or self._pacing_mode == 'vsync_only'
+        mode = (value, self.flags, vsync)
+        if (mode == self._display_mode
+                and self._screen.get_size() == tuple(value)):
+            return  # Don't reallocate an identical display surface
+        self._screen = pygame.display.set_mode(value, self.flags, vsync=vsync)
+        self._display_mode = mode
+        self._hardware = bool(
+            self.flags & (pygame.OPENGL | pygame.SCALED | pygame.DOUBLEBUF))
+        # pygame silently ignores vsync without a renderer or OpenGL
+        self._vsynced = vsync and bool(
+            self.flags & (pygame.OPENGL | pygame.SCALED))
 
     @property
     def active_scene(self):
         """The currently active scene. Can be ``None``."""
         return self._scene
 
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.quit()
+
+    def quit(self):
+        """Shut down :mod:`pygame` and close the window.
+
+        The application can't be used anymore after this.
+        """
+        pygame.quit()
+        self._subsystems.clear()
+
+    def _init_subsystem(self, name):
+        if name in self._subsystems:
+            return
+        if name not in _SUBSYSTEMS:
+            raise ValueError('Unknown subsystem: {!r}'.format(name))
+        getattr(pygame, _SUBSYSTEMS[name]).init()
+        self._subsystems.add(name)
+
     def change_scene(self, scene):
         """Change the currently active scene.
 
         This will invoke :meth:`.Scene.on_exit` and
         :meth:`.Scene.on_enter` methods on the switching scenes.
 
+        If called while the application is running, the change is
+        deferred until the current frame has been drawn, so that the
+        new scene's first update doesn't receive a stale ``dt``.
+
+        Changing into the already active scene does nothing.
         If ``None`` is provided, the application's execution will end.
 
         :param Scene|None scene: the scene to change into
         """
-        if self.active_scene is not None:
-            self.active_scene.on_exit(next_scene=scene)
-            self.active_scene._application = None
-        self._scene, old_scene = scene, self.active_scene
-        if self.active_scene is not None:
-            self.active_scene._application = self
-            self.active_scene.on_enter(previous_scene=old_scene)
+        if self._running:
+            self._pending_scene = scene
+        else:
+            self._switch_scene(scene)
+
+    def _switch_scene(self, scene):
+        old_scene = self._scene
+        if scene is old_scene:
+            return
+        if scene is not None:
+            # Fail before leaving the old scene if a subsystem can't start
+            for name in scene.required_subsystems:
+                self._init_subsystem(name)
+        if old_scene is not None:
+            old_scene.on_exit(next_scene=scene)
+            old_scene._application = None
+        self._scene = scene
+        if scene is not None:
+            scene._application = self
+            scene.dirty = True  # The screen still shows the old scene
+            event_mask = scene.event_mask
+            if (event_mask is None and scene.event_handlers
+                    and not scene._overrides_handle_event):
+                # Nothing but the registered handlers wants any events
+                event_mask = tuple(scene.event_handlers)
+            self._event_mask = event_mask
+            if event_mask is None:
+                # Nothing handles the events, so they're just discarded
+                self._needs_events = scene._overrides_handle_event
+            else:
+                self._needs_events = bool(event_mask)
+            if self._running:
+                self._block_events()
+            scene.on_enter(previous_scene=old_scene)
+
+    def _block_events(self):
+        # Blocked events are dropped by SDL before reaching pygame
+        if self._event_mask is None:
+            self._unblock_events()
+            return
+        if self._blocked_events is None:
+            # Remember what was blocked before, to restore it afterwards
+            self._blocked_events = [
+                event_type for event_type in range(pygame.NUMEVENTS)
+                if pygame.event.get_blocked(event_type)]
+        pygame.event.set_blocked(None)
+        pygame.event.set_allowed([*self._event_mask, pygame.QUIT])
+
+    def _unblock_events(self):
+        if self._blocked_events is None:
+            return  # The events were never blocked by a scene's mask
+        pygame.event.set_allowed(None)
+        if self._blocked_events:
+            pygame.event.set_blocked(self._blocked_events)
+        self._blocked_events = None
+
+    def _shutdown(self):
+        # Only the exit half of _switch_scene(None), for quitting
+        scene = self._scene
+        scene.on_exit(next_scene=None)
+        scene._application = None
+        self._scene = None
+        self._pending_scene = _SENTINEL
 
     def run(self, scene=None):
         """Execute the application.
 
+        Each frame waits for the frame's turn, handles the pending
+        events, updates and draws the active scene, and finally presents
+        the drawn frame on the display.  Presenting last means that the
+        time a vsynced display spends waiting for the monitor counts
+        towards the next frame's delay, instead of delaying the events.
+
         :param scene.Scene|None scene: scene to start the execution from
         """
         if scene is None:
@@ -95,18 +359,149 @@ class Application:
         else:
             self.change_scene(scene)
 
-        clock = pygame.time.Clock()
+        self._running = True
+        try:
+            self._block_events()
+            self._run_loop()
+        finally:
+            self._running = False
+            # The blocked events are global to SDL, so unblock them
+            if pygame.display.get_init():
+                self._unblock_events()
+
+    def _limit_fps(self, target_frame_ns):
+        """Wait until the target time has passed since the last frame.
 
-        while self.active_scene is not None:
+        Frames are scheduled from the previous frame's deadline rather
+        than from when it actually ended, so oversleeping one frame
+        doesn't make the frame rate drift.
 
-            for event in pygame.event.get():
-                self.active_scene.handle_event(event)
-                if event.type == pygame.QUIT:
-                    self.change_scene(None)  # Trigger Scene.on_exit()
+        :param int target_frame_ns: minimum frame length in nanoseconds
+        :return: time in nanoseconds since the last frame
+        :rtype: int
+        """
+        now = time.monotonic_ns()
+        deadline = self._deadline_ns + target_frame_ns
+        if now - deadline > target_frame_ns:
+            deadline = now  # Too far behind to catch up, start over
+        if self._pacing_mode != 'spin':
+            # Sleeping releases the GIL for any other threads
+            remaining = deadline - now - _SPIN_NS
+            if remaining > 0:
+                time.sleep(remaining / 1e9)
+                now = time.monotonic_ns()
+        while now < deadline:
+            now = time.monotonic_ns()
+        elapsed = now - self._last_frame_ns
+        self._last_frame_ns = now
+        self._deadline_ns = deadline
+        return elapsed
+
+    def _run_loop(self):
+        limit_fps = self._limit_fps
+        monotonic_ns = time.monotonic_ns
+        get_events = pygame.event.get
+        peek_event = pygame.event.peek
+        wait_event = pygame.event.wait
+        clear_events = pygame.event.clear
+        display_update = pygame.display.update
+        display_flip = pygame.display.flip
+        NOEVENT = pygame.NOEVENT
+        QUIT = pygame.QUIT
+        self._last_frame_ns = self._deadline_ns = monotonic_ns()
+
+        scene = None
+        presented = False
+        while True:
+
+            if self._pending_scene is not _SENTINEL:
+                pending, self._pending_scene = self._pending_scene, _SENTINEL
+                self._switch_scene(pending)
+            if self._scene is not scene:
+                scene = self._scene
+                if scene is None:
                     return
+                # Look the scene's methods up only once per scene change
+                event_mask = self._event_mask
+                needs_events = self._needs_events
+                handlers = scene.event_handlers
+                handle_event = scene.handle_event
+                update = scene.update
+                updates = scene._overrides_update
+                draw = scene.draw
+                # Don't count the scene change in the new scene's dt
+                limit_fps(0)
+                lag = 0
+
+            # Pump the events only once per frame, after the frame delay
+            if scene.idle:
+                # Sleep until an event arrives or the next frame is due
+                since_last = (monotonic_ns() - self._last_frame_ns) // 1000000
+                timeout = self._frame_ms - since_last
+                # wait(0) waits forever, so only poll if the frame is due
+                # or there's no update rate to wait for
+                if self._frame_ms and timeout > 0:
+                    event = wait_event(timeout)
+                    events = [] if event.type == NOEVENT else [event]
+                else:
+                    events = []
+                elapsed = limit_fps(0)
+            elif (presented and self._vsynced
+                    and self._pacing_mode == 'vsync_only'):
+                # Presenting the last frame already waited for vsync
+                elapsed = limit_fps(0)
+                events = []
+            else:
+                elapsed = limit_fps(self._frame_ns)
+                events = []
+
+            # Check for QUIT first so the rest can be filtered by the mask
+            if peek_event(QUIT) or (events and events[0].type == QUIT):
+                for event in events + get_events(QUIT, pump=False):
+                    handlers.get(event.type, handle_event)(event)
+                self._shutdown()  # Trigger Scene.on_exit()
+                return
+            # Checking for QUIT already pumped the queue
+            if needs_events:
+                if event_mask is None:
+                    events += get_events(pump=False)
+                else:
+                    events += get_events(event_mask, pump=False)
+                for event in events:
+                    handlers.get(event.type, handle_event)(event)
+            else:
+                # Don't let the unhandled events fill up the queue
+                clear_events(pump=False)
 
-            dt = clock.tick(self.update_rate)
-            self.active_scene.update(dt)
+            step = self._frame_ns
+            if not updates:
+                pass  # No need to call the empty Scene.update()
+            elif self.fixed_timestep and step:
+                # Catch up at most a few steps to not fall further behind
+                lag = min(lag + elapsed, _MAX_STEPS * step)
+                while lag >= step:
+                    update(step / 1000000)
+                    lag -= step
+                    if self._pending_scene is not _SENTINEL:
+                        break  # The scene is done, don't update it more
+                self.interpolation = lag / step
+            else:
+                # Round the timestamps instead of the elapsed time, so the
+                # fractions of a millisecond add up over the frames
+                now = self._last_frame_ns
+                update(now // 1000000 - (now - elapsed) // 1000000)
 
-            self.active_scene.draw(self._screen)
-            pygame.display.update()
+            presented = scene.dirty
+            if not presented:
+                continue
+            screen = self._screen
+            rects = draw(screen)
+            if self._hardware or rects is None:
+                display_flip()
+            else:
+                width, height = screen.get_size()
+                rects = _coalesce_rects(rects, width * height)
+                if rects is None:
+                    display_flip()
+                else:
+                    display_update(rects)
@@ -1,3 +1,8 @@
+from types import MappingProxyType
+
+_SCENE_SETTINGS = ('title', 'resolution', 'update_rate')
+
+
 class Scene:
     """An isolated scene which can be ran by an application.
 
@@ -83,10 +88,102 @@ class Scene:
         my_scene0 = MyScene()
         my_scene0.resolution = (1280, 720)
         my_scene1 = MyScene(title='My Second Awesome Scene')
+
+    Scenes that only change in response to events, such as menus and
+    pause screens, can set the ``idle`` class variable to ``True``.
+    The application then sleeps until an event arrives or the next
+    frame is due, instead of waking up at a fixed rate.  Without an
+    update rate there's no frame to wait for, so idle scenes are then
+    run as fast as possible, just like other scenes:
+
+    .. code-block:: python
+
+        class PauseMenu(Scene):
+            idle = True
+
+    Similarly, the ``event_mask`` class variable can be set to
+    a sequence of the event types the scene is interested in.
+    All other events (except for :data:`pygame.QUIT`) are then blocked
+    while the scene is being run and never reach :meth:`handle_event`:
+
+    .. code-block:: python
+
+        class PauseMenu(Scene):
+            event_mask = (pygame.KEYDOWN, pygame.MOUSEBUTTONUP)
+
+    Instead of checking ``event.type`` in :meth:`handle_event`, events
+    can be dispatched to handlers registered by their type in the
+    ``event_handlers`` dict.  Events without a registered handler are
+    still sent to :meth:`handle_event`.  If :meth:`handle_event` isn't
+    overridden and no ``event_mask`` is set, all the other event types
+    are blocked.  Scenes with no handlers at all discard all events,
+    except for :data:`pygame.QUIT`.  The handlers must be registered
+    before the scene is entered:
+
+    .. code-block:: python
+
+        class PauseMenu(Scene):
+
+            def __init__(self):
+                super().__init__()
+                self.event_handlers = {
+                    pygame.KEYDOWN: self.on_key_down,
+                    pygame.MOUSEBUTTONUP: self.on_click,
+                }
+
+    Scenes are drawn every frame for as long as their ``dirty``
+    attribute is ``True``, which it is by default.  Scenes that rarely
+    change can set it to ``False`` after drawing and back to ``True``
+    with :meth:`mark_dirty` whenever something visible changes, to skip
+    both the drawing and the display update in between.  It's reset to
+    ``True`` whenever the scene is entered:
+
+    .. code-block:: python
+
+        class PauseMenu(Scene):
+
+            def draw(self, screen):
+                ...
+                self.dirty = False
+
+            def handle_event(self, event):
+                if event.type == pygame.KEYDOWN:
+                    self.selection += 1
+                    self.mark_dirty()
+
+    Scenes that need the audio, joysticks or fonts can list them in
+    the ``required_subsystems`` class variable, and the corresponding
+    :mod:`pygame` modules are initialized before the scene is entered:
+
+    .. code-block:: python
+
+        class Game(Scene):
+            required_subsystems = ('audio', 'joystick')
+
+    The host application is stored in a slot for faster access,
+    but scenes keep their ``__dict__`` so that the settings above
+    can be overridden per instance and subclasses can freely add
+    attributes of their own.  Subclasses may declare ``__slots__``
+    to store their own frequently used attributes in slots as well.
     """
+    __slots__ = ('_application', '__dict__')
     title = None
     resolution = None
     update_rate = None
+    idle = False
+    event_mask = None
+    event_handlers = MappingProxyType({})
+    dirty = True
+    required_subsystems = ()
+    _overrides_handle_event = False
+    _overrides_update = False
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # Resolve these once per class instead of on every scene change
+        cls._overrides_handle_event = (
+            cls.handle_event is not Scene.handle_event)
+        cls._overrides_update = cls.update is not Scene.update
 
     def __init__(self, title=None, resolution=None, update_rate=None):
         self._application = None
@@ -102,23 +199,46 @@ class Scene:
         """The host application that's currently running the scene."""
         return self._application
 
+    def mark_dirty(self):
+        """Have the scene drawn again on the next frame."""
+        self.dirty = True
+
     def draw(self, screen):
         """Override this with the scene drawing.
 
+        Optionally return the areas of the screen that were changed,
+        e.g. the rects returned by :meth:`pygame.Surface.blit` or
+        :meth:`pygame.sprite.RenderUpdates.draw`, and only those areas
+        are updated on the display.  Returning ``None`` (the default)
+        updates the whole screen.
+
+        A few small rects are much cheaper to update than the full
+        screen, but the per-rect overhead adds up quickly; scenes that
+        change many small areas at once (dozens of rects) should rather
+        return ``None``.
+
+        On double buffered or hardware accelerated displays (see
+        :class:`.Application`'s ``flags``) the returned rects are ignored
+        and the whole display is flipped.  The back buffer may then
+        still hold an older frame, so the whole screen should be drawn.
+
         :param pygame.Surface screen: screen to draw the scene on
+        :return: changed areas of the screen, or ``None`` for all of it
+        :rtype: list[pygame.Rect]|None
         """
 
     def update(self, dt):
         """Override this with the scene update tick.
 
-        :param int dt: time in milliseconds since the last update
+        :param int|float dt: time in milliseconds since the last update
         """
 
     def handle_event(self, event):
         """Override this to handle an event in the scene.
 
-        All of :mod:`pygame`'s events are sent here, so filtering
-        should be applied manually in the subclass.
+        All of :mod:`pygame`'s events are sent here unless
+        the scene's ``event_mask`` is set, so filtering should
+        otherwise be applied manually in the subclass.
 
         :param pygame.event.Event event: event to handle
         """
@@ -136,10 +256,11 @@ class Scene:
 
         :param Scene|None previous_scene: previous scene to run
         """
-        for attr in ('title', 'resolution', 'update_rate'):
+        application = self._application
+        for attr in _SCENE_SETTINGS:
             value = getattr(self, attr)
             if value is not None:
-                setattr(self.application, attr.lower(), value)
+                setattr(application, attr, value)
 
     def on_exit(self, next_scene):
         """Override this to deinitialize upon scene exiting.